@@ -1,10 +1,22 @@
 from flask import Flask
-from core.routes import main
 
-app = Flask(__name__)
-app.secret_key = "secret_key"
 
-app.register_blueprint(main)
+def create_app():
+    # Imported here so spawned worker processes, which re-import this module
+    # as __mp_main__, don't connect to MongoDB or load the face gallery
+    from core.routes import main
+    from core.archive import migrate_legacy_logs
+
+    # Logs from before the datetime change would otherwise be invisible to date queries
+    migrated = migrate_legacy_logs()
+    if migrated:
+        print(f"--- Migrated {migrated} legacy log records ---")
+
+    app = Flask(__name__)
+    app.secret_key = "secret_key"
+
+    app.register_blueprint(main)
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,162 @@
+"""
+Per-frame allocation benchmark for the video feed hot loop.
+
+Runs the original frame path (fresh resize/cvtColor arrays, per-frame labels)
+and the current one (FaceSystem.process_frame with reused buffers and cached
+label patches) over the same frames and reports, per frame, the transient
+peak memory seen by tracemalloc and the memory retained after the run. The
+'part' rows isolate building the MJPEG part from an encoded JPEG
+(tobytes() + concatenation vs multipart_part).
+
+Face detection is replaced by a fixed synthetic detector and identification
+by one shared stub (no gallery sync or DB lookups), so both paths do the same
+work and the numbers reflect the frame path rather than dlib or MongoDB.
+
+    pip install mongomock
+    python benchmarks/frame_alloc.py --frames 300
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import install_mongo_stand_in
+
+# Boxes in downscaled (SCALE) coordinates, as returned by face_locations
+SYNTHETIC_BOXES = [(20, 60, 60, 20), (30, 140, 70, 100)]
+
+
+def install_synthetic_detector(face_recognition, np):
+    face_recognition.face_locations = lambda image, **kwargs: list(SYNTHETIC_BOXES)
+    face_recognition.face_encodings = lambda image, locations, **kwargs: [
+        np.zeros(128) for _ in locations
+    ]
+
+
+def synthetic_identify(face_locations, face_encodings, state_vars):
+    # Used by both paths in place of FaceSystem._identify
+    state_vars['last_locs'] = face_locations
+    state_vars['last_names'] = ["Unknown" for _ in face_locations]
+    state_vars['last_statuses'] = ["unknown" for _ in face_locations]
+    state_vars['detected'] = None
+
+
+# --- ORIGINAL FRAME PATH (before buffer reuse) ---
+def legacy_frame(frame, frame_count, state_vars, cv2, face_recognition, scale):
+    upscale = int(1 / scale)
+    if frame_count % 6 == 0:
+        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb_small_frame, model="hog", number_of_times_to_upsample=0)
+        encodings = face_recognition.face_encodings(rgb_small_frame, locations, num_jitters=1)
+        synthetic_identify(locations, encodings, state_vars)
+
+    for (top, right, bottom, left), name in zip(state_vars.get('last_locs', []), state_vars.get('last_names', [])):
+        top *= upscale
+        right *= upscale
+        bottom *= upscale
+        left *= upscale
+        color = (100, 100, 100)
+        label = f"{name}"
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        cv2.putText(frame, label, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.7, (255, 255, 255), 1)
+
+    ret, buffer = cv2.imencode('.jpg', frame)
+    return [legacy_part(buffer)]
+
+
+def legacy_part(buffer):
+    data = buffer.tobytes()
+    return b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n'
+
+
+# --- CURRENT FRAME PATH ---
+def current_frame(frame, frame_count, state_vars, cv2, face_system, multipart_part):
+    frame = face_system.process_frame(frame, frame_count, state_vars)
+    ret, buffer = cv2.imencode('.jpg', frame)
+    return [multipart_part(buffer)]
+
+
+def measure(name, step, frames, source, out):
+    """Copies each source frame into `out` (as the ring reader does) and runs one step on it."""
+    peaks = []
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for i in range(frames):
+        out[...] = source[i % len(source)]
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step(out, i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    peaks.sort()
+    return {
+        'name': name,
+        'ms_per_frame': elapsed / frames * 1000,
+        'avg_kb': sum(peaks) / len(peaks) / 1024,
+        'p95_kb': peaks[int(0.95 * (len(peaks) - 1))] / 1024,
+        'retained_kb': retained / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame allocation benchmark (tracemalloc).")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='attendance_alloc_'))
+    install_mongo_stand_in()
+
+    import cv2
+    import numpy as np
+    import face_recognition
+    install_synthetic_detector(face_recognition, np)
+
+    from core.config import SCALE
+    from core.recognition import face_system
+    from core.routes import multipart_part
+    face_system._identify = synthetic_identify
+
+    rng = np.random.default_rng(1)
+    source = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(8)]
+    out = np.empty_like(source[0])
+
+    legacy_state = {}
+    current_state = {'last_locs': [], 'last_names': [], 'verified_name': None,
+                     'timer_start': 0, 'recorded': False, 'detected': None}
+
+    results = [
+        measure('before', lambda f, i: legacy_frame(f, i, legacy_state, cv2, face_recognition, SCALE),
+                args.frames, source, out),
+        measure('after', lambda f, i: current_frame(f, i, current_state, cv2, face_system, multipart_part),
+                args.frames, source, out),
+    ]
+    # Same encoded frame for both, so only the part building differs
+    ret, jpeg = cv2.imencode('.jpg', source[0])
+    results += [
+        measure('part/old', lambda f, i: legacy_part(jpeg), args.frames, source, out),
+        measure('part/new', lambda f, i: multipart_part(jpeg), args.frames, source, out),
+    ]
+
+    print(f"{'path':<10}{'ms/frame':>10}{'avg KB':>10}{'p95 KB':>10}{'retained KB':>14}")
+    for r in results:
+        print(f"{r['name']:<10}{r['ms_per_frame']:>10.2f}{r['avg_kb']:>10.1f}{r['p95_kb']:>10.1f}{r['retained_kb']:>14.1f}")
+    print("(avg/p95 KB: transient peak allocated while processing one frame)")
+
+
+if __name__ == "__main__":
+    main()
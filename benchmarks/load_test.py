@@ -0,0 +1,265 @@
+"""
+HTTP load test for the Flask blueprint.
+
+Seeds an in-memory MongoDB stand-in (mongomock) with classes, students and
+logs, serves the app on a local threaded server and drives each route with
+N concurrent clients. Video routes read from a looping video file instead of
+a webcam.
+
+    pip install mongomock
+    python benchmarks/load_test.py --video sample.mp4 --clients 8 --output run.json
+    python benchmarks/load_test.py --video sample.mp4 --clients 8 --compare run.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import http.client
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+PAGE_ROUTES = ['index', 'check_update', 'download_report', 'manage_students']
+FEED_ROUTES = ['video_feed', 'preview_feed']
+
+
+# --- SETUP ---
+def install_mongo_stand_in():
+    """Swaps pymongo's client for mongomock before core.config connects."""
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is required for the load test: pip install mongomock")
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+
+def seed_database(num_classes, students_per_class, num_days, seed):
+    from core.config import classes_col, logs_col, faces_col
+    from core.archive import day_start
+
+    rng = random.Random(seed)
+    students = [f"Student_{i:05d}" for i in range(num_classes * students_per_class)]
+    faces_col.insert_many([
+        {"name": name, "encoding": [rng.uniform(-0.3, 0.3) for _ in range(128)]}
+        for name in students
+    ])
+
+    classes = []
+    for c in range(num_classes):
+        roster = students[c * students_per_class:(c + 1) * students_per_class]
+        classes.append({
+            "class_id": f"C{c:03d}",
+            "students": roster,
+            "subjects": [
+                {"teacher": "Teacher A", "subject": "Math", "start_time": "08:00 AM", "late_time": "08:15 AM"},
+                {"teacher": "Teacher B", "subject": "Science", "start_time": "10:00 AM", "late_time": "10:15 AM"}
+            ]
+        })
+    classes_col.insert_many(classes)
+
+    today = day_start()
+    logs = []
+    for d in range(1, num_days + 1):
+        day = today - timedelta(days=d)
+        for cls in classes:
+            for subject in cls['subjects']:
+                for name in cls['students']:
+                    status = rng.choice(["Present", "Present", "Present", "Late", "Absent"])
+                    logs.append({
+                        "Name": name,
+                        "Class": cls['class_id'],
+                        "Teacher": subject['teacher'],
+                        "Subject": subject['subject'],
+                        "Date": day,
+                        "Time": None if status == "Absent" else day.replace(hour=8, minute=rng.randint(0, 30)),
+                        "Status": status
+                    })
+        if len(logs) >= 10000:
+            logs_col.insert_many(logs)
+            logs = []
+    if logs:
+        logs_col.insert_many(logs)
+
+    return [c['class_id'] for c in classes], logs_col.count_documents({})
+
+def start_server(port):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    server = make_server('127.0.0.1', port, create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# --- CLIENTS ---
+def route_path(route, class_ids, rng):
+    if route == 'index':
+        return f"/?session_key={rng.choice(class_ids)}|{rng.randint(0, 1)}"
+    return f"/{route}"
+
+def page_client(port, route, class_ids, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', route_path(route, class_ids, rng))
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                errors.append(resp.status)
+                continue
+        except Exception as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def feed_client(port, route, deadline, latencies, errors):
+    """Reads frames from an MJPEG stream; each inter-frame gap counts as one request."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request('GET', f"/{route}")
+        resp = conn.getresponse()
+        last = time.perf_counter()
+        while time.perf_counter() < deadline:
+            line = resp.readline()
+            if not line:
+                errors.append('stream closed')
+                break
+            if line == b'--frame\r\n':
+                now = time.perf_counter()
+                latencies.append(now - last)
+                last = now
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        conn.close()
+
+
+# --- MEASUREMENT ---
+def percentile(sorted_values, pct):
+    if not sorted_values: return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def run_route(port, route, class_ids, clients, duration):
+    latencies = []
+    errors = []
+    mem_before = tracemalloc.get_traced_memory()[0]
+    deadline = time.perf_counter() + duration
+
+    threads = []
+    for i in range(clients):
+        if route in FEED_ROUTES:
+            t = threading.Thread(target=feed_client, args=(port, route, deadline, latencies, errors))
+        else:
+            t = threading.Thread(target=page_client, args=(port, route, class_ids, deadline, latencies, errors, i))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    mem_after = tracemalloc.get_traced_memory()[0]
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_s': round(len(latencies) / duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'mem_growth_kb': round((mem_after - mem_before) / 1024, 1)
+    }
+
+def print_report(results, previous=None):
+    header = f"{'route':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mem KB':>10}{'errors':>8}"
+    if previous:
+        header += f"{'req/s Δ':>10}{'p95 Δ':>10}"
+    print(header)
+    print('-' * len(header))
+    for route, r in results['routes'].items():
+        line = (f"{route:<16}{r['requests_per_s']:>10}{str(r['p50_ms']):>10}{str(r['p95_ms']):>10}"
+                f"{str(r['p99_ms']):>10}{r['mem_growth_kb']:>10}{r['errors']:>8}")
+        old = previous['routes'].get(route) if previous else None
+        if old:
+            line += f"{_delta(r['requests_per_s'], old['requests_per_s']):>10}{_delta(r['p95_ms'], old['p95_ms']):>10}"
+        print(line)
+
+def _delta(new, old):
+    if not new or not old: return '-'
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load test for the attendance dashboard.")
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--students', type=int, default=40, help="Students per class")
+    parser.add_argument('--days', type=int, default=30, help="Days of attendance history to seed")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent clients per route")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per route")
+    parser.add_argument('--routes', default=','.join(PAGE_ROUTES + FEED_ROUTES))
+    parser.add_argument('--video', help="Video file served as the camera (required for feed routes)")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--compare', help="Previous JSON results to diff against")
+    args = parser.parse_args()
+
+    # Resolve paths before switching to the scratch directory
+    for key in ('video', 'output', 'compare'):
+        if getattr(args, key):
+            setattr(args, key, os.path.abspath(getattr(args, key)))
+
+    routes = [r.strip() for r in args.routes.split(',') if r.strip()]
+    if not args.video:
+        routes = [r for r in routes if r not in FEED_ROUTES]
+    else:
+        os.environ['CAMERA_SOURCE'] = args.video
+
+    # Keep image/ and archive/ folders out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix='attendance_load_'))
+
+    install_mongo_stand_in()
+    tracemalloc.start()
+
+    print("--- Seeding database ---")
+    class_ids, log_count = seed_database(args.classes, args.students, args.days, args.seed)
+    print(f"--- {len(class_ids)} classes, {args.classes * args.students} students, {log_count} logs ---")
+
+    server = start_server(args.port)
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'routes': {}
+    }
+    try:
+        for route in routes:
+            print(f"--- {route}: {args.clients} clients for {args.duration}s ---")
+            results['routes'][route] = run_route(args.port, route, class_ids, args.clients, args.duration)
+    finally:
+        server.shutdown()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"--- Results written to {args.output} ---")
+
+
+if __name__ == "__main__":
+    main()
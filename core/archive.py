@@ -0,0 +1,330 @@
+import os
+import csv
+import gzip
+import json
+import uuid
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from bson import json_util
+from core.config import logs_col, ARCHIVE_PATH, ARCHIVE_AFTER_DAYS
+from core.cache import bump_version
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%I:%M %p'
+FIELDNAMES = ["Name", "Class", "Teacher", "Subject", "Date", "Time", "Status"]
+MANIFEST_FILE = os.path.join(ARCHIVE_PATH, 'manifest.json')
+# Ids and partition sizes of an archive run that hasn't finished yet
+JOURNAL_FILE = os.path.join(ARCHIVE_PATH, 'pending.json')
+LOCK_FILE = os.path.join(ARCHIVE_PATH, '.lock')
+
+# Manifest is cached in memory and re-read only when the file changes
+_manifest_cache = {'mtime': None, 'data': {}}
+
+# Job threads inside one worker; the lock file covers other workers and the CLI
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _archive_lock():
+    """Serializes partition/manifest rewrites across threads and processes."""
+    with _thread_lock:
+        if not os.path.exists(ARCHIVE_PATH):
+            os.makedirs(ARCHIVE_PATH, exist_ok=True)
+        with open(LOCK_FILE, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# --- DATE HELPERS ---
+def day_start(value=None):
+    """Returns midnight of the given day ('YYYY-MM-DD', date or datetime). Defaults to today."""
+    if value is None:
+        value = datetime.now()
+    if isinstance(value, str):
+        return datetime.strptime(value, DATE_FORMAT)
+    if isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    raise ValueError(f"Unsupported date value: {value!r}")
+
+def format_log(log):
+    """Converts a stored log (datetime fields) into the display format used by templates and CSV."""
+    row = dict(log)
+    row.pop('_id', None)
+    log_date = row.get('Date')
+    log_time = row.get('Time')
+    if isinstance(log_date, datetime):
+        row['Date'] = log_date.strftime(DATE_FORMAT)
+    if isinstance(log_time, datetime):
+        row['Time'] = log_time.strftime(TIME_FORMAT)
+    elif log_time is None:
+        row['Time'] = "-"
+    return row
+
+
+# --- MANIFEST ---
+def _partition_path(month_key):
+    return os.path.join(ARCHIVE_PATH, f"logs_{month_key}.csv.gz")
+
+def _load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    stat = os.stat(MANIFEST_FILE)
+    # Size too: another process may rewrite it within the same mtime tick
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    if _manifest_cache['mtime'] != mtime:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            _manifest_cache['data'] = json.load(f)
+        _manifest_cache['mtime'] = mtime
+    return _manifest_cache['data']
+
+def _tmp_path(path):
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+def _write_atomic(path, text):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _save_manifest(manifest):
+    _write_atomic(MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True))
+    # Refresh the cache directly; two saves within one mtime tick would otherwise look unchanged
+    stat = os.stat(MANIFEST_FILE)
+    _manifest_cache['data'] = manifest
+    _manifest_cache['mtime'] = (stat.st_mtime_ns, stat.st_size)
+
+def get_archived_dates():
+    """All dates ('YYYY-MM-DD') that have at least one archived record."""
+    dates = set()
+    for month_dates in _load_manifest().values():
+        dates.update(month_dates)
+    return dates
+
+
+# --- ARCHIVE TIER ---
+def _iter_partition(month_key):
+    path = _partition_path(month_key)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row
+
+def read_logs(target_date=None, class_id=None, subject=None):
+    """
+    Reads archived logs in display format. When a date is given only that
+    month's partition is opened.
+    """
+    manifest = _load_manifest()
+    if target_date:
+        month_key = target_date[:7]
+        if target_date not in manifest.get(month_key, []):
+            return
+        months = [month_key]
+    else:
+        months = sorted(manifest.keys())
+
+    for month_key in months:
+        for row in _iter_partition(month_key):
+            if target_date and row['Date'] != target_date: continue
+            if class_id and row['Class'] != class_id: continue
+            if subject and row['Subject'] != subject: continue
+            yield row
+
+def _delete_hot(ids):
+    for i in range(0, len(ids), 1000):
+        logs_col.delete_many({"_id": {"$in": ids[i:i + 1000]}})
+
+def _recover_pending():
+    """
+    Completes or undoes an archive run that stopped part-way. Once the rows are
+    on disk ('written') only the MongoDB delete is repeated; otherwise the
+    partitions are cut back to their old length and the old manifest restored,
+    so the rows are archived exactly once by the next run.
+    """
+    if not os.path.exists(JOURNAL_FILE):
+        return
+    with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
+        journal = json_util.loads(f.read())
+
+    if journal['written']:
+        _delete_hot(journal['ids'])
+        bump_version()
+        print(f"ARCHIVE: Finished interrupted run ({len(journal['ids'])} records).")
+    else:
+        for month_key, size in journal['sizes'].items():
+            path = _partition_path(month_key)
+            if not os.path.exists(path):
+                continue
+            if size is None:
+                os.remove(path)
+            else:
+                # Appends only add whole gzip members after `size`
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        _save_manifest(journal['manifest'])
+        print("ARCHIVE: Rolled back interrupted run.")
+    os.remove(JOURNAL_FILE)
+
+def archive_logs(before=None):
+    """
+    Moves every hot log older than `before` (default: ARCHIVE_AFTER_DAYS ago)
+    into gzip-CSV partitions, one file per month, then removes them from MongoDB.
+    Each run is journaled, so a crash never archives the same rows twice.
+    """
+    with _archive_lock():
+        _recover_pending()
+
+        if before is None:
+            before = datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        cutoff = day_start(before)
+
+        # Group by month so each partition is opened once
+        partitions = {}
+        archived_ids = []
+        for log in logs_col.find({"Date": {"$lt": cutoff}}).sort("Date", 1):
+            archived_ids.append(log['_id'])
+            row = format_log(log)
+            partitions.setdefault(row['Date'][:7], []).append(row)
+
+        if not archived_ids:
+            return 0
+
+        manifest = dict(_load_manifest())
+        journal = {
+            'ids': archived_ids,
+            'manifest': manifest,
+            'sizes': {
+                month_key: os.path.getsize(_partition_path(month_key))
+                if os.path.exists(_partition_path(month_key)) else None
+                for month_key in partitions
+            },
+            'written': False,
+        }
+        _write_atomic(JOURNAL_FILE, json_util.dumps(journal))
+
+        new_manifest = dict(manifest)
+        for month_key, rows in partitions.items():
+            path = _partition_path(month_key)
+            is_new = journal['sizes'][month_key] is None
+            # Appending writes a new gzip member; readers see one continuous stream,
+            # so only the first member carries the header row
+            with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+                if is_new:
+                    writer.writeheader()
+                writer.writerows(rows)
+            month_dates = set(new_manifest.get(month_key, []))
+            month_dates.update(row['Date'] for row in rows)
+            new_manifest[month_key] = sorted(month_dates)
+            if is_new:
+                print(f"ARCHIVE: Created partition {month_key}")
+
+        _save_manifest(new_manifest)
+        journal['written'] = True
+        _write_atomic(JOURNAL_FILE, json_util.dumps(journal))
+
+        # Only drop from the hot collection once the archive is on disk
+        _delete_hot(archived_ids)
+        os.remove(JOURNAL_FILE)
+        bump_version()
+
+        print(f"ARCHIVE: Moved {len(archived_ids)} records older than {cutoff.strftime(DATE_FORMAT)}.")
+        return len(archived_ids)
+
+def purge_logs(class_id=None, name=None):
+    """Removes archived records matching a class and/or student by rewriting affected partitions."""
+    if not class_id and not name:
+        return 0
+    with _archive_lock():
+        # A half-finished archive run must be settled before partitions are rewritten
+        _recover_pending()
+
+        manifest = dict(_load_manifest())
+        removed = 0
+        for month_key in list(manifest.keys()):
+            kept = []
+            dropped = 0
+            for row in _iter_partition(month_key):
+                if (not class_id or row['Class'] == class_id) and (not name or row['Name'] == name):
+                    dropped += 1
+                else:
+                    kept.append(row)
+            if not dropped:
+                continue
+
+            path = _partition_path(month_key)
+            if kept:
+                tmp_path = _tmp_path(path)
+                with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+                    writer.writeheader()
+                    writer.writerows(kept)
+                os.replace(tmp_path, path)
+                manifest[month_key] = sorted({row['Date'] for row in kept})
+            else:
+                os.remove(path)
+                del manifest[month_key]
+            removed += dropped
+
+        if removed:
+            _save_manifest(manifest)
+        return removed
+
+def migrate_legacy_logs():
+    """
+    Converts logs written with string Date/Time fields to native datetimes.
+    Runs at app startup; safe to run from several workers at once.
+    """
+    migrated = 0
+    for log in logs_col.find({"Date": {"$type": "string"}}):
+        log_date = datetime.strptime(log['Date'], DATE_FORMAT)
+        log_time = None
+        if log.get('Time') and log['Time'] != "-":
+            t = datetime.strptime(log['Time'], TIME_FORMAT)
+            log_time = log_date.replace(hour=t.hour, minute=t.minute)
+        # Only matches while still a string, so a concurrent worker's conversion isn't redone
+        result = logs_col.update_one(
+            {"_id": log['_id'], "Date": {"$type": "string"}},
+            {"$set": {"Date": log_date, "Time": log_time}}
+        )
+        migrated += result.modified_count
+    if migrated:
+        bump_version()
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old attendance logs to compressed CSV partitions.")
+    parser.add_argument('--before', help="Archive records dated before this day (YYYY-MM-DD), e.g. the end of a closed term.")
+    parser.add_argument('--migrate', action='store_true',
+                        help="Only convert legacy string Date/Time fields (combine with --before to also archive).")
+    args = parser.parse_args()
+
+    if args.migrate:
+        print(f"--- Migrated {migrate_legacy_logs()} legacy records ---")
+        if not args.before:
+            raise SystemExit(0)
+    count = archive_logs(args.before)
+    print(f"--- Archived {count} records ---")
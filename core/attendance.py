@@ -1,30 +1,56 @@
 import time
 from datetime import datetime
-from core.config import logs_col
+from pymongo import UpdateOne
+from core.config import logs_col, SHARED_STATE_TTL
 from core.data_manager import get_students_in_class
+from core.archive import day_start, format_log, read_logs, get_archived_dates
+from core.cache import state, bump_version, current_version
+from core.shared_state import save_session, load_session
 
-# Global state
+# Global state: local copy of the session shared through the 'runtime' collection
 active_session = None
-state = {'last_update_time': time.time()}
+_session_synced_at = 0
+
+def get_active_session():
+    """Active session as seen by all workers (re-read at most every SHARED_STATE_TTL)."""
+    global active_session, _session_synced_at
+    if time.time() - _session_synced_at >= SHARED_STATE_TTL:
+        active_session = load_session()
+        _session_synced_at = time.time()
+    return active_session
 
 def set_active_session(class_id, subject_idx, subject_info):
-    global active_session
-    active_session = {
+    global active_session, _session_synced_at
+    current = get_active_session()
+    session = {
         'class_id': str(class_id).strip(),
         'subject_idx': int(subject_idx),
         'info': subject_info
     }
-    print(f"DEBUG: Session Active: {class_id} - {subject_info.get('subject')}")
-    initialize_attendance()
+    # Re-selecting the same session on the same day with unchanged data needs no DB work
+    if (current and current.get('date') == day_start()
+            and current.get('version') == current_version()
+            and all(current.get(k) == v for k, v in session.items())):
+        return
 
-def initialize_attendance():
+    print(f"DEBUG: Session Active: {class_id} - {subject_info.get('subject')}")
+    # Work on the local dict: a concurrent get_active_session() may replace the
+    # global with the old shared session while we initialize
+    initialize_attendance(session)
+    session['date'] = day_start()
+    session['version'] = current_version()
+    save_session(session)
+    active_session = session
+    _session_synced_at = time.time()
+
+def initialize_attendance(session):
     """Batch creates Absent records for missing students."""
-    if not active_session: return
+    if not session: return
 
-    today = datetime.now().strftime('%Y-%m-%d')
-    class_id = active_session['class_id']
-    subject_name = active_session['info']['subject']
-    teacher = active_session['info']['teacher']
+    today = day_start()
+    class_id = session['class_id']
+    subject_name = session['info']['subject']
+    teacher = session['info']['teacher']
 
     students = get_students_in_class(class_id)
     if not students: return
@@ -47,19 +73,20 @@ def initialize_attendance():
                 "Teacher": teacher,
                 "Subject": subject_name,
                 "Date": today,
-                "Time": "-",
+                "Time": None,
                 "Status": "Absent"
             })
 
     if new_logs:
         logs_col.insert_many(new_logs)
-        state['last_update_time'] = time.time()
+        bump_version()
         print(f"INIT: Added {len(new_logs)} absent records.")
 
 def get_scan_status(name):
-    if not active_session: return None
+    session = get_active_session()
+    if not session: return None
     
-    class_id = active_session['class_id']
+    class_id = session['class_id']
     students = get_students_in_class(class_id)
     
     # 1. Check if student is in this class
@@ -67,8 +94,8 @@ def get_scan_status(name):
         return 'not_in_class'
         
     # 2. Check current status in DB
-    today = datetime.now().strftime('%Y-%m-%d')
-    subject_name = active_session['info']['subject']
+    today = day_start()
+    subject_name = session['info']['subject']
     
     log = logs_col.find_one({
         "Name": name,
@@ -82,25 +109,27 @@ def get_scan_status(name):
             
     return 'ready'
 
-def mark_attendance(name):
-    global active_session, state
-    if not active_session: return False
-
-    today = datetime.now().strftime('%Y-%m-%d')
-    subject_name = active_session['info']['subject']
-    class_id = active_session['class_id']
-    
-    now = datetime.now()
-    time_str = now.strftime('%I:%M %p')
-    
-    # Check Late Time
-    late_limit_str = active_session['info'].get('late_time', '11:59 PM')
+def resolve_status(subject_info, when):
+    """Present, or Late if `when` is after the subject's late time."""
+    late_limit_str = subject_info.get('late_time', '11:59 PM')
     status = "Present"
     try:
         late_limit = datetime.strptime(late_limit_str, '%I:%M %p').time()
-        if now.time() > late_limit:
+        if when.time() > late_limit:
             status = "Late"
     except: pass
+    return status
+
+def mark_attendance(name):
+    session = get_active_session()
+    if not session: return False
+
+    now = datetime.now()
+    today = day_start(now)
+    subject_name = session['info']['subject']
+    class_id = session['class_id']
+    
+    status = resolve_status(session['info'], now)
 
     # Update DB
     result = logs_col.update_one(
@@ -113,25 +142,74 @@ def mark_attendance(name):
         },
         {
             "$set": {
-                "Time": time_str,
+                "Time": now,
                 "Status": status
             }
         }
     )
 
     if result.modified_count > 0:
-        state['last_update_time'] = time.time()
+        bump_version()
         print(f"UPDATE: {name} marked as {status}")
         return True
 
     return False
 
+def mark_attendance_bulk(class_id, subject_info, names, when=None):
+    """
+    Marks a batch of recognized students for one session in a single bulk write.
+    Missing roster entries are created as Absent first, then recognized students
+    are upgraded to Present/Late with the same rules as mark_attendance.
+    """
+    if when is None: when = datetime.now()
+    class_id = str(class_id).strip()
+    day = day_start(when)
+    subject_name = subject_info['subject']
+    status = resolve_status(subject_info, when)
+
+    # Match names case-insensitively against the roster, like get_scan_status
+    roster = {str(s).lower(): s for s in get_students_in_class(class_id)}
+    present = sorted({roster[n.lower()] for n in names if n.lower() in roster})
+    not_in_class = sorted({n for n in names if n.lower() not in roster})
+
+    ops = []
+    for student in roster.values():
+        key = {"Name": student, "Date": day, "Class": class_id, "Subject": subject_name}
+        ops.append(UpdateOne(
+            key,
+            {"$setOnInsert": {"Teacher": subject_info.get('teacher'), "Time": None, "Status": "Absent"}},
+            upsert=True
+        ))
+    for student in present:
+        key = {"Name": student, "Date": day, "Class": class_id, "Subject": subject_name, "Status": "Absent"}
+        ops.append(UpdateOne(key, {"$set": {"Time": when, "Status": status}}))
+
+    marked = 0
+    if ops:
+        result = logs_col.bulk_write(ops, ordered=True)
+        marked = result.modified_count
+        if result.modified_count or result.upserted_count:
+            bump_version()
+        print(f"BATCH: {marked} students marked as {status} in {class_id} - {subject_name}")
+
+    return {'recognized': present, 'not_in_class': not_in_class, 'marked': marked, 'status': status}
+
 def get_records(target_date=None):
     if not target_date: target_date = datetime.now().strftime('%Y-%m-%d')
     
-    query = {"Date": target_date}
-    if active_session:
-        query["Class"] = active_session['class_id']
-        query["Subject"] = active_session['info']['subject']
-
-    return list(logs_col.find(query, {"_id": 0}))
\ No newline at end of file
+    query = {"Date": day_start(target_date)}
+    class_id = subject_name = None
+    session = get_active_session()
+    if session:
+        class_id = session['class_id']
+        subject_name = session['info']['subject']
+        query["Class"] = class_id
+        query["Subject"] = subject_name
+
+    records = [format_log(log) for log in logs_col.find(query, {"_id": 0})]
+
+    # Older days may live (partly) in the compressed archive
+    if target_date in get_archived_dates():
+        records.extend(read_logs(target_date, class_id, subject_name))
+
+    return records
@@ -0,0 +1,151 @@
+"""
+Offline attendance from recorded classroom videos or group photos.
+
+    python -m core.batch C101 0 lesson.mp4
+    python -m core.batch C101 0 photo1.jpg photo2.jpg --time 08:05
+"""
+import os
+import cv2
+import argparse
+import multiprocessing as mp
+import face_recognition
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+SAMPLE_EVERY_SECONDS = 0.5
+MAX_WIDTH = 1280
+
+
+# --- WORKERS (run in child processes, keep free of DB imports) ---
+def _encode_rgb(rgb, max_width):
+    if rgb.shape[1] > max_width:
+        scale = max_width / rgb.shape[1]
+        rgb = cv2.resize(rgb, (0, 0), fx=scale, fy=scale)
+    locations = face_recognition.face_locations(rgb, model="hog", number_of_times_to_upsample=1)
+    if not locations:
+        return []
+    return face_recognition.face_encodings(rgb, locations, num_jitters=1)
+
+def _encode_image(path, max_width):
+    image = face_recognition.load_image_file(path)
+    return _encode_rgb(image, max_width)
+
+def _encode_video_chunk(path, frame_indices, max_width):
+    """Decodes a contiguous range of the video and encodes the sampled frames."""
+    cap = cv2.VideoCapture(path)
+    encodings = []
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_indices[0])
+        wanted = set(frame_indices)
+        for idx in range(frame_indices[0], frame_indices[-1] + 1):
+            # grab() skips the decode cost for frames we don't sample
+            if not cap.grab(): break
+            if idx not in wanted: continue
+            ok, frame = cap.retrieve()
+            if not ok: continue
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            encodings.extend(_encode_rgb(rgb, max_width))
+    finally:
+        cap.release()
+    return encodings
+
+
+# --- PIPELINE ---
+def _video_tasks(path, workers, sample_every):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    step = max(1, int(round(fps * sample_every)))
+    sampled = list(range(0, total, step))
+    if not sampled: return []
+
+    # One contiguous chunk per task so each worker seeks once
+    chunk_size = max(1, -(-len(sampled) // (workers * 2)))
+    return [sampled[i:i + chunk_size] for i in range(0, len(sampled), chunk_size)]
+
+def extract_encodings(paths, workers=None, sample_every=SAMPLE_EVERY_SECONDS, max_width=MAX_WIDTH):
+    """Detects and encodes every face in the given videos/images across a process pool."""
+    workers = workers or os.cpu_count() or 1
+    encodings = []
+    # spawn: forking a threaded web worker (Mongo client, camera thread) is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = []
+        for path in paths:
+            if path.lower().endswith(VIDEO_EXTENSIONS):
+                for chunk in _video_tasks(path, workers, sample_every):
+                    futures.append(pool.submit(_encode_video_chunk, path, chunk, max_width))
+            else:
+                futures.append(pool.submit(_encode_image, path, max_width))
+        for future in futures:
+            encodings.extend(future.result())
+    return encodings
+
+def identify(encodings, gallery, tolerance):
+    """
+    Deduplicates identities across frames: each encoding is assigned to its
+    closest gallery match; unmatched encodings are grouped so the same stranger
+    seen in many frames counts once.
+    """
+    names = set()
+    unknown = []
+    for encoding in encodings:
+        if gallery.names:
+            distances = face_recognition.face_distance(gallery.encodings, encoding)
+            best = int(np.argmin(distances))
+            if distances[best] <= tolerance:
+                names.add(gallery.names[best])
+                continue
+        if not unknown or np.min(face_recognition.face_distance(np.array(unknown), encoding)) > tolerance:
+            unknown.append(encoding)
+    return names, len(unknown)
+
+def run_batch_attendance(paths, class_id, subject_idx, when=None, workers=None):
+    """Processes recorded media for one class/subject session and marks attendance in bulk."""
+    # Imported here so worker processes don't open DB connections or load the gallery
+    from core.config import MATCH_TOLERANCE
+    from core.data_manager import get_all_classes
+    from core.attendance import mark_attendance_bulk
+    from core.recognition import face_system
+
+    classes = get_all_classes()
+    subjects = classes.get(class_id, {}).get('subjects', [])
+    if not 0 <= subject_idx < len(subjects):
+        raise ValueError(f"No subject #{subject_idx} in class {class_id}")
+
+    encodings = extract_encodings(paths, workers)
+    # Pick up students enrolled through other workers before matching
+    face_system.sync_gallery(wait=True)
+    names, unknown_count = identify(encodings, face_system.gallery, MATCH_TOLERANCE)
+
+    result = mark_attendance_bulk(class_id, subjects[subject_idx], names, when)
+    result['faces'] = len(encodings)
+    result['unknown'] = unknown_count
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded video or group photos.")
+    parser.add_argument('class_id')
+    parser.add_argument('subject_idx', type=int, help="Index of the subject in the class schedule")
+    parser.add_argument('files', nargs='+', help="Video file or image files")
+    parser.add_argument('--date', help="Session date (YYYY-MM-DD), defaults to today")
+    parser.add_argument('--time', help="Recording time (HH:MM, 24h) used for Late rules, defaults to now")
+    parser.add_argument('--workers', type=int, help="Worker processes, defaults to CPU count")
+    args = parser.parse_args()
+
+    when = datetime.now()
+    if args.date:
+        when = datetime.strptime(args.date, '%Y-%m-%d').replace(hour=when.hour, minute=when.minute)
+    if args.time:
+        t = datetime.strptime(args.time, '%H:%M')
+        when = when.replace(hour=t.hour, minute=t.minute)
+
+    result = run_batch_attendance(args.files, args.class_id, args.subject_idx, when, args.workers)
+    print(f"--- {result['faces']} faces, {len(result['recognized'])} students recognized, "
+          f"{result['marked']} marked {result['status']}, {result['unknown']} unknown ---")
+    if result['not_in_class']:
+        print(f"--- Not enrolled in {args.class_id}: {', '.join(result['not_in_class'])} ---")
@@ -0,0 +1,82 @@
+import time
+import threading
+from collections import OrderedDict
+from pymongo import ReturnDocument
+from core.config import VIEW_CACHE_SIZE, SHARED_STATE_TTL, runtime_col
+
+# Global state: local copy of the 'versions' document shared by all workers.
+# 'version' is bumped by every write to classes, faces or logs,
+# 'gallery_version' only by changes to face encodings.
+state = {'version': 0, 'gallery_version': 0, 'last_update_time': time.time(), 'synced_at': 0}
+_version_lock = threading.Lock()
+
+
+def _apply(doc):
+    # A slow read must never move the local copy backwards
+    if doc and doc.get('version', 0) >= state['version']:
+        state['version'] = doc.get('version', 0)
+        state['gallery_version'] = doc.get('gallery_version', 0)
+        state['last_update_time'] = doc.get('last_update_time', state['last_update_time'])
+    state['synced_at'] = time.time()
+
+def _refresh():
+    # Other workers' writes become visible within SHARED_STATE_TTL
+    if time.time() - state['synced_at'] < SHARED_STATE_TTL: return
+    doc = runtime_col.find_one({'_id': 'versions'})
+    with _version_lock:
+        _apply(doc)
+
+def bump_version(gallery=False):
+    inc = {'version': 1}
+    if gallery: inc['gallery_version'] = 1
+    doc = runtime_col.find_one_and_update(
+        {'_id': 'versions'},
+        {'$inc': inc, '$set': {'last_update_time': time.time()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    with _version_lock:
+        _apply(doc)
+        return state['version']
+
+def current_version():
+    _refresh()
+    return state['version']
+
+def current_gallery_version():
+    _refresh()
+    return state['gallery_version']
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU for rendered pages and report bodies. Keys end with
+    the data version they were built from; entries of an older version can
+    never be hit again, so storing a newer one drops them.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data: return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            version = key[-1]
+            for stale in [k for k in self.data if k[-1] < version]:
+                del self.data[stale]
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+view_cache = LRUCache(VIEW_CACHE_SIZE)
+# Full-history CSV bodies are large: keep only the newest one
+report_cache = LRUCache(1)
@@ -1,13 +1,217 @@
 import cv2
+import time
 import atexit
+import threading
+from core.config import CAMERA_SOURCE, INFERENCE_WORKERS, FRAME_RING_SLOTS, SCALE, CAMERA_LEASE_SECONDS
+from core.frame_ring import FrameRing, InferencePool
+from core.shared_state import acquire_camera_lease, release_camera_lease, get_camera_lease
 
 global_capture = None
+frame_reader = None
+_reader_lock = threading.Lock()
+
+
+class LoopingCapture:
+    """File-backed stand-in for a webcam: rewinds the video when it reaches the end."""
+
+    def __init__(self, path):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        success, frame = self.capture.read()
+        if not success:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        return success, frame
+
+    def set(self, prop, value):
+        return self.capture.set(prop, value)
+
+    def release(self):
+        self.capture.release()
+
+
+class _RingReader:
+    """Shared helpers for readers that hand out (seq, slot) references into a FrameRing."""
+
+    def read_into(self, seq, slot, out=None):
+        """Copies a slot into `out` (allocated on first use). Returns None if it was overwritten or the ring closed."""
+        ring = self.ring
+        if ring is None: return None
+        view = ring.view(slot)
+        if view is None: return None
+        if out is None or out.shape != view.shape:
+            out = view.copy()
+        else:
+            out[...] = view
+        if ring.stamp(slot) != seq: return None
+        return out
+
+    def _close(self):
+        if self.pool:
+            self.pool.stop()
+            self.pool = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+
+class FrameReader(_RingReader):
+    """
+    Single thread that owns camera.read() and writes every frame into a
+    shared-memory FrameRing. Streams wait for the newest (seq, slot) and
+    inference workers read the same slots without copies. Only the worker
+    holding the camera lease runs one of these.
+    """
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.ring = None
+        self.pool = None
+        self.latest = None
+        self.running = True
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        seq = 0
+        last_result_seq = -1
+        renewed_at = time.time()
+        while self.running and self.capture.isOpened():
+            success, frame = self.capture.read()
+            if not success: break
+            if self.ring is None:
+                self.ring = FrameRing(FRAME_RING_SLOTS, frame.shape)
+                if INFERENCE_WORKERS > 0:
+                    self.pool = InferencePool(self.ring, INFERENCE_WORKERS, SCALE)
+                # Publish the ring so other workers can stream from it
+                acquire_camera_lease(self._ring_info())
+            elif time.time() - renewed_at > CAMERA_LEASE_SECONDS / 3:
+                if not acquire_camera_lease(self._ring_info()):
+                    print("--- Camera lease lost, stopping reader ---")
+                    break
+                renewed_at = time.time()
+            seq += 1
+            slot = self.ring.write(seq, frame)
+            if self.pool:
+                # Inference runs only here, in the camera owner; every stream in
+                # every worker reads the results back from the ring
+                self.pool.submit(seq, slot)
+                result = self.pool.poll()
+                if result and result[0] > last_result_seq:
+                    last_result_seq = result[0]
+                    self.ring.publish_result(*result)
+            with self.cond:
+                self.latest = (seq, slot)
+                self.cond.notify_all()
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def _ring_info(self):
+        return {'name': self.ring.name, 'slots': self.ring.slots, 'shape': list(self.ring.shape),
+                'inference': self.pool is not None}
+
+    @property
+    def results(self):
+        """Ring carrying detections from the inference pool, or None when detecting in-process."""
+        return self.ring if self.pool else None
+
+    def wait_frame(self, last_seq, timeout=2.0):
+        """Blocks until a frame newer than last_seq is available. Returns (seq, slot) or None."""
+        is_newer = lambda: self.latest is not None and self.latest[0] > last_seq
+        with self.cond:
+            self.cond.wait_for(lambda: not self.running or is_newer(), timeout)
+            return self.latest if is_newer() else None
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=2)
+        self._close()
+        release_camera_lease()
+
+
+class RingFollower(_RingReader):
+    """
+    Used by workers that don't own the camera: attaches to the owner's ring
+    by name and polls slot stamps for new frames.
+    """
+    POLL_INTERVAL = 0.005
+    LEASE_CHECK_INTERVAL = 2.0
+
+    def __init__(self, ring_info):
+        self.ring = FrameRing(ring_info['slots'], ring_info['shape'], name=ring_info['name'], untrack=True)
+        # Followers never start their own pool; they reuse the owner's published detections
+        self.pool = None
+        self.inference = ring_info.get('inference', False)
+        self.running = True
+        self.checked_at = time.time()
+
+    def wait_frame(self, last_seq, timeout=2.0):
+        deadline = time.time() + timeout
+        while self.running and time.time() < deadline:
+            ring = self.ring
+            if ring is None: break
+            seq = ring.newest()
+            if seq > last_seq:
+                return (seq, seq % ring.slots)
+            if time.time() - self.checked_at > self.LEASE_CHECK_INTERVAL:
+                # Owner gone or restarted with a new ring; a new owner publishes
+                # "ring": None until its first frame, which also ends this stream
+                lease = get_camera_lease()
+                if not lease or (lease.get('ring') or {}).get('name') != ring.name:
+                    self.running = False
+                    break
+                self.checked_at = time.time()
+            time.sleep(self.POLL_INTERVAL)
+        return None
+
+    @property
+    def results(self):
+        return self.ring if self.inference else None
+
+    def stop(self):
+        self.running = False
+        self._close()
+
+
+def get_frame_reader():
+    """
+    Returns this worker's frame source: the camera itself if we hold (or can
+    take) the lease, otherwise a follower on the owner's ring. None when the
+    owner hasn't published its ring yet.
+    """
+    global frame_reader
+    with _reader_lock:
+        if frame_reader is None or not frame_reader.running:
+            if frame_reader: frame_reader.stop()
+            frame_reader = None
+            if acquire_camera_lease():
+                frame_reader = FrameReader(get_camera())
+            else:
+                lease = get_camera_lease()
+                if lease and lease.get('ring'):
+                    try:
+                        frame_reader = RingFollower(lease['ring'])
+                    except FileNotFoundError:
+                        # Owner exited without releasing its lease
+                        frame_reader = None
+        return frame_reader
 
 
 def get_camera():
     global global_capture
     if global_capture is None or not global_capture.isOpened():
-        global_capture = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        if not CAMERA_SOURCE.isdigit():
+            global_capture = LoopingCapture(CAMERA_SOURCE)
+            return global_capture
+
+        global_capture = cv2.VideoCapture(int(CAMERA_SOURCE), cv2.CAP_DSHOW)
 
         # 🔥 LOW LATENCY CAMERA SETTINGS
         global_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
@@ -19,7 +223,11 @@ def get_camera():
 
 
 def release_camera():
-    global global_capture
+    global global_capture, frame_reader
+    with _reader_lock:
+        if frame_reader:
+            frame_reader.stop()
+            frame_reader = None
     if global_capture and global_capture.isOpened():
         global_capture.release()
     global_capture = None
@@ -1,7 +1,11 @@
 import os
 import shutil 
+import uuid
 import numpy as np
+from datetime import datetime
 from core.config import classes_col, logs_col, faces_col, DATASET_PATH
+from core.cache import bump_version
+from core.archive import DATE_FORMAT, format_log, read_logs, purge_logs, get_archived_dates
 
 # --- CLASS MANAGEMENT ---
 def create_class_group(class_id):
@@ -11,6 +15,7 @@ def create_class_group(class_id):
             "students": [],
             "subjects": []
         })
+        bump_version()
 
 def add_subject_to_class(class_id, teacher, subject_name, start_time, late_time):
     new_subject = {
@@ -23,6 +28,7 @@ def add_subject_to_class(class_id, teacher, subject_name, start_time, late_time)
         {"class_id": class_id},
         {"$push": {"subjects": new_subject}}
     )
+    bump_version()
 
 def update_subject_in_class(class_id, subject_index, teacher, subject_name, start_time, late_time):
     key = f"subjects.{subject_index}"
@@ -36,6 +42,7 @@ def update_subject_in_class(class_id, subject_index, teacher, subject_name, star
         {"class_id": class_id},
         {"$set": {key: updated_subject}}
     )
+    bump_version()
 
 def delete_class(class_id):
     # 1. Delete the Class Definition from 'classes' collection
@@ -44,6 +51,8 @@ def delete_class(class_id):
     # 2. Delete ALL Attendance Logs for this specific class from 'logs' collection
     # This ensures no "ghost" data remains for the deleted class.
     logs_col.delete_many({"Class": class_id})
+    purge_logs(class_id=class_id)
+    bump_version()
 
 def remove_subject(class_id, subject_index):
     classes_col.update_one(
@@ -54,12 +63,14 @@ def remove_subject(class_id, subject_index):
         {"class_id": class_id},
         {"$pull": {"subjects": None}}
     )
+    bump_version()
 
 def add_student_to_class(class_id, student_name):
     classes_col.update_one(
         {"class_id": class_id},
         {"$addToSet": {"students": student_name}}
     )
+    bump_version()
 
 def remove_student_from_class(class_id, student_name):
     """
@@ -77,6 +88,8 @@ def remove_student_from_class(class_id, student_name):
         "Class": class_id,
         "Name": student_name
     })
+    purge_logs(class_id=class_id, name=student_name)
+    bump_version()
 
 def get_students_in_class(class_id):
     data = classes_col.find_one({"class_id": class_id}, {"students": 1})
@@ -94,11 +107,24 @@ def save_student_face(name, encoding):
         {
             "$set": {
                 "name": name,
-                "encoding": encoding.tolist()
+                "encoding": encoding.tolist(),
+                # Lets other workers re-fetch only the faces that changed
+                "revision": uuid.uuid4().hex
             }
         },
         upsert=True
     )
+    # Bumped after the write so workers that see the new version also see the face
+    bump_version(gallery=True)
+
+def get_face_revisions():
+    """Name -> revision for every face, without the encodings."""
+    all_faces = faces_col.find({}, {"_id": 0, "name": 1, "revision": 1})
+    return {face['name']: face.get('revision') for face in all_faces}
+
+def get_face_encodings(names):
+    all_faces = faces_col.find({"name": {"$in": list(names)}}, {"_id": 0, "name": 1, "encoding": 1})
+    return {face['name']: face['encoding'] for face in all_faces}
 
 def get_all_face_encodings():
     all_faces = faces_col.find({}, {"_id": 0, "name": 1, "encoding": 1})
@@ -117,6 +143,7 @@ def delete_student_globally(student_name):
     """
     # 1. Delete Face Data
     faces_col.delete_one({"name": student_name})
+    bump_version(gallery=True)
     
     # 2. Remove from ALL Class lists
     classes_col.update_many(
@@ -124,8 +151,9 @@ def delete_student_globally(student_name):
         {"$pull": {"students": student_name}}
     )
     
-    # 3. Delete ALL Logs
+    # 3. Delete ALL Logs (hot collection and archive)
     logs_col.delete_many({"Name": student_name})
+    purge_logs(name=student_name)
     
     # 4. Delete Image Folder
     folder_path = os.path.join(DATASET_PATH, student_name)
@@ -135,12 +163,18 @@ def delete_student_globally(student_name):
         except Exception as e:
             print(f"Error deleting folder: {e}")
 
+    bump_version()
+
 # --- LOGGING MANAGEMENT ---
 def append_log(record):
     logs_col.insert_one(record)
+    bump_version()
 
 def get_all_logs():
-    return list(logs_col.find({}, {"_id": 0}))
+    # Archived (older) records first, then the hot collection
+    logs = list(read_logs())
+    logs.extend(format_log(log) for log in logs_col.find({}, {"_id": 0}))
+    return logs
 
 def get_all_classes():
     all_docs = classes_col.find({}, {"_id": 0})
@@ -152,6 +186,9 @@ def get_all_classes():
     return result
 
 def get_available_dates():
-    dates = logs_col.distinct("Date")
-    dates.sort(reverse=True)
-    return dates
\ No newline at end of file
+    dates = {
+        d.strftime(DATE_FORMAT) if isinstance(d, datetime) else d
+        for d in logs_col.distinct("Date")
+    }
+    dates.update(get_archived_dates())
+    return sorted(dates, reverse=True)
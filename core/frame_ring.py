@@ -0,0 +1,222 @@
+import os
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+import cv2
+import face_recognition
+import numpy as np
+
+STAMP_BYTES = 8
+# Result block after the frame slots: [seq, count] then MAX_FACES boxes and encodings
+MAX_FACES = 16
+ENCODING_SIZE = 128
+
+
+class FrameRing:
+    """
+    Fixed number of frame slots in one shared memory block. Each slot has a
+    sequence stamp in front of the pixel data: the writer sets it to -1 while
+    copying and to the frame's sequence number afterwards, so readers can check
+    that a slot was not overwritten while they used it. A small result block
+    at the end carries the newest detections (same stamping scheme), so every
+    worker streaming from the ring reuses the owner's inference.
+    """
+
+    def __init__(self, slots, shape, name=None, untrack=False):
+        """
+        Creates a new ring, or attaches to an existing one by `name`. Processes
+        that don't share the owner's resource tracker (other web workers) must
+        pass untrack=True, otherwise their tracker unlinks the ring when they exit.
+        """
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.frame_bytes = int(np.prod(self.shape))
+        frames_end = slots * (STAMP_BYTES + self.frame_bytes)
+        size = frames_end + 2 * STAMP_BYTES + MAX_FACES * 4 * 4 + MAX_FACES * ENCODING_SIZE * 4
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            if untrack and os.name == 'posix':
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.stamps = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8,
+                                 buffer=self.shm.buf, offset=slots * STAMP_BYTES)
+        offset = frames_end
+        self.result_header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+        offset += 2 * STAMP_BYTES
+        self.result_boxes = np.ndarray((MAX_FACES, 4), dtype=np.int32, buffer=self.shm.buf, offset=offset)
+        offset += MAX_FACES * 4 * 4
+        self.result_encodings = np.ndarray((MAX_FACES, ENCODING_SIZE), dtype=np.float32,
+                                           buffer=self.shm.buf, offset=offset)
+        if self.owner:
+            self.stamps[:] = -1
+            self.result_header[:] = (-1, 0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, seq, frame):
+        slot = seq % self.slots
+        self.stamps[slot] = -1
+        if frame.shape == self.shape:
+            np.copyto(self.frames[slot], frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self.frames[slot])
+        self.stamps[slot] = seq
+        return slot
+
+    def view(self, slot):
+        """Zero-copy NumPy view of a slot, or None once the ring is closed. Check stamp() before and after use."""
+        frames = self.frames
+        if frames is None: return None
+        return frames[slot]
+
+    def stamp(self, slot):
+        # -1 after close, so a reader's stamp check fails instead of raising
+        stamps = self.stamps
+        if stamps is None: return -1
+        return int(stamps[slot])
+
+    def newest(self):
+        """Highest sequence number written so far, -1 if none or closed."""
+        stamps = self.stamps
+        if stamps is None: return -1
+        return int(stamps.max())
+
+    def publish_result(self, seq, locations, encodings):
+        """Stores the detections for frame `seq` (owner only)."""
+        count = min(len(locations), MAX_FACES)
+        self.result_header[0] = -1
+        for i in range(count):
+            self.result_boxes[i] = locations[i]
+            self.result_encodings[i] = encodings[i]
+        self.result_header[1] = count
+        self.result_header[0] = seq
+
+    def latest_result(self):
+        """Newest (seq, locations, encodings), or None if none yet / being written / closed."""
+        header, boxes, encs = self.result_header, self.result_boxes, self.result_encodings
+        if header is None or boxes is None or encs is None: return None
+        seq = int(header[0])
+        if seq < 0: return None
+        count = int(header[1])
+        locations = [tuple(int(v) for v in box) for box in boxes[:count]]
+        encodings = [e.copy() for e in encs[:count]]
+        if int(header[0]) != seq: return None
+        return seq, locations, encodings
+
+    def close(self):
+        # Views must be dropped before the buffer can be released; readers that
+        # still hold the ring then get None from view() and treat it as end of stream
+        self.stamps = None
+        self.frames = None
+        self.result_header = None
+        self.result_boxes = None
+        self.result_encodings = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A reader still holds a view; the mapping goes away with it
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# --- INFERENCE WORKERS ---
+def _inference_worker(ring_name, slots, shape, scale, tasks, results):
+    cv2.setNumThreads(1)
+    ring = FrameRing(slots, shape, name=ring_name)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None: break
+            seq, slot = task
+            if ring.stamp(slot) != seq: continue
+
+            small_frame = cv2.resize(ring.view(slot), (0, 0), fx=scale, fy=scale)
+            # Frame was overwritten while we read it
+            if ring.stamp(slot) != seq: continue
+
+            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            face_locations = face_recognition.face_locations(
+                rgb_small_frame,
+                model="hog",
+                number_of_times_to_upsample=0
+            )
+            face_encodings = []
+            if face_locations:
+                face_encodings = face_recognition.face_encodings(
+                    rgb_small_frame,
+                    face_locations,
+                    num_jitters=1
+                )
+            results.put((seq, face_locations, [e.astype(np.float32) for e in face_encodings]))
+    finally:
+        ring.close()
+
+
+class InferencePool:
+    """
+    Worker processes that run detection + encoding on ring slots. Only the
+    (seq, slot) pair goes to a worker and only locations/encodings come back.
+    """
+
+    def __init__(self, ring, workers, scale):
+        ctx = mp.get_context('spawn')
+        # Bounded so a slow pool drops frames instead of building a backlog
+        self.tasks = ctx.Queue(maxsize=workers)
+        self.results = ctx.Queue()
+        self.lock = threading.Lock()
+        self.last_submitted = -1
+        self.latest = None
+        self.processes = [
+            ctx.Process(target=_inference_worker,
+                        args=(ring.name, ring.slots, ring.shape, scale, self.tasks, self.results),
+                        daemon=True)
+            for _ in range(workers)
+        ]
+        for p in self.processes:
+            p.start()
+        print(f"--- Started {workers} inference workers ---")
+
+    def submit(self, seq, slot):
+        with self.lock:
+            # Several streams share one camera; only submit each frame once
+            if seq <= self.last_submitted: return False
+            try:
+                self.tasks.put_nowait((seq, slot))
+            except queue.Full:
+                return False
+            self.last_submitted = seq
+            return True
+
+    def poll(self):
+        """Returns the newest (seq, locations, encodings) result seen so far, or None."""
+        with self.lock:
+            while True:
+                try:
+                    result = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if self.latest is None or result[0] > self.latest[0]:
+                    self.latest = result
+            return self.latest
+
+    def stop(self):
+        for _ in self.processes:
+            try:
+                self.tasks.put(None, timeout=1)
+            except queue.Full:
+                break
+        for p in self.processes:
+            p.join(timeout=2)
+            if p.is_alive(): p.terminate()
@@ -0,0 +1,88 @@
+import time
+import uuid
+import queue
+import threading
+import traceback
+from pymongo import DESCENDING
+from core.config import JOB_WORKERS, runtime_col
+from core.shared_state import WORKER_ID
+
+MAX_FINISHED_JOBS = 100
+
+# Global state: jobs run on this worker's threads, but their records live in the
+# 'runtime' collection so /jobs answers the same on every web worker
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _job_key(job_id):
+    return f"job:{job_id}"
+
+def _update(job_id, **fields):
+    runtime_col.update_one({"_id": _job_key(job_id)}, {"$set": fields})
+
+def _worker():
+    while True:
+        job_id, func, args, kwargs = _queue.get()
+        _update(job_id, status='running', started_at=time.time())
+        try:
+            result = func(*args, **kwargs)
+            _update(job_id, status='done', result=result, finished_at=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            _update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            _queue.task_done()
+
+def _start_workers():
+    # Workers are started lazily so importing this module has no side effects
+    with _workers_lock:
+        if _workers: return
+        for i in range(JOB_WORKERS):
+            t = threading.Thread(target=_worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+def _prune_finished():
+    finished = runtime_col.find(
+        {"kind": "job", "status": {"$in": ["done", "failed"]}}, {"_id": 1}
+    ).sort("finished_at", DESCENDING).skip(MAX_FINISHED_JOBS)
+    stale = [doc["_id"] for doc in finished]
+    if stale:
+        runtime_col.delete_many({"_id": {"$in": stale}})
+
+def _public(doc):
+    job = dict(doc)
+    job.pop('_id', None)
+    job.pop('kind', None)
+    return job
+
+def submit(description, func, *args, **kwargs):
+    """Queues func(*args, **kwargs) on a background worker and returns the job id."""
+    job_id = uuid.uuid4().hex[:12]
+    _start_workers()
+    _prune_finished()
+    runtime_col.insert_one({
+        '_id': _job_key(job_id),
+        'kind': 'job',
+        'id': job_id,
+        'description': description,
+        'worker': WORKER_ID,
+        'status': 'queued',
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'result': None,
+        'error': None
+    })
+    _queue.put((job_id, func, args, kwargs))
+    print(f"JOB: Queued {job_id} - {description}")
+    return job_id
+
+def get_job(job_id):
+    doc = runtime_col.find_one({"_id": _job_key(job_id)})
+    return _public(doc) if doc else None
+
+def list_jobs():
+    return [_public(doc) for doc in runtime_col.find({"kind": "job"}).sort("created_at", DESCENDING)]
@@ -2,43 +2,195 @@ import cv2
 import face_recognition
 import numpy as np
 import time
-from core.config import MATCH_TOLERANCE, SCALE
-from core.data_manager import get_all_face_encodings
+import threading
+from collections import namedtuple
+from core.config import MATCH_TOLERANCE, SCALE, SHARED_STATE_TTL
+from core.cache import current_gallery_version
+from core.data_manager import get_all_face_encodings, get_face_revisions, get_face_encodings
 from core.attendance import mark_attendance, get_scan_status
 
 cv2.setUseOptimized(True)
 cv2.setNumThreads(4)
 
+LABEL_HEIGHT = 35
+LABEL_CACHE_SIZE = 256
+# kind -> (BGR color, label text)
+LABEL_STYLES = {
+    "ok": ((0, 255, 0), "{name} (OK)"),
+    "verifying": ((0, 165, 255), "{name}..."),
+    "scannable": ((0, 0, 255), "{name}"),
+    "done": ((0, 215, 255), "{name} (Done)"),
+    "unknown": ((100, 100, 100), "Unknown"),
+}
+_label_cache = {}
+
+
+class GallerySnapshot(namedtuple('GallerySnapshot', ['version', 'names', 'encodings'])):
+    """
+    Immutable view of the known faces. Names and encodings always come from the
+    same version, so readers never see them out of sync.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, version, faces):
+        names = tuple(faces.keys())
+        if names:
+            encodings = np.array([faces[n] for n in names], dtype=np.float32)
+        else:
+            encodings = np.empty((0, 128), dtype=np.float32)
+        encodings.setflags(write=False)
+        return cls(version, names, encodings)
+
 
 class FaceSystem:
     def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+        # Readers grab self.gallery once per frame without locking; writers
+        # build a new snapshot under _write_lock and swap the reference.
+        self.gallery = GallerySnapshot.build(0, {})
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Shared gallery version / per-face revisions this worker last loaded
+        self.synced_gallery_version = 0
+        self.revisions = {}
+        self._sync_thread = None
+        self._sync_start_lock = threading.Lock()
         self.load_training_data()
 
     def load_training_data(self):
-        self.known_face_encodings.clear()
-        self.known_face_names.clear()
-
         print("--- Loading Face Data from MongoDB... ---")
 
+        # Read the version first: a change racing with the load triggers another sync
+        gallery_version = current_gallery_version()
+        revisions = get_face_revisions()
         faces_data = get_all_face_encodings()
 
-        for name, encoding_list in faces_data.items():
-            self.known_face_names.append(name)
-            self.known_face_encodings.append(
-                np.array(encoding_list, dtype=np.float32)
-            )
+        with self._write_lock:
+            self.gallery = GallerySnapshot.build(self.gallery.version + 1, faces_data)
+        self.revisions = revisions
+        self.synced_gallery_version = gallery_version
+
+        print(f"--- Loaded {len(self.gallery.names)} students from DB. ---")
+
+    def sync_gallery(self, wait=False):
+        """
+        Applies face changes made by other workers. Cheap when nothing changed
+        (cached version check); otherwise only changed encodings are fetched.
+        With wait=True, waits for a sync already running in another thread.
+        """
+        gallery_version = current_gallery_version()
+        if gallery_version == self.synced_gallery_version: return
+        if not self._sync_lock.acquire(blocking=wait): return
+        try:
+            # The sync we waited for may already have covered this version
+            if gallery_version == self.synced_gallery_version: return
+            revisions = get_face_revisions()
+            changed = [n for n, rev in revisions.items() if self.revisions.get(n) != rev]
+            removed = [n for n in self.gallery.names if n not in revisions]
+            added = get_face_encodings(changed) if changed else {}
+            if added or removed:
+                self.update_gallery(added=added, removed=removed)
+                print(f"--- Gallery sync: {len(added)} updated, {len(removed)} removed ---")
+            self.revisions = revisions
+            self.synced_gallery_version = gallery_version
+        finally:
+            self._sync_lock.release()
+
+    def update_gallery(self, added=None, removed=None):
+        """
+        Publishes a new gallery version with a batch of changes.
+        `added` maps name -> encoding (replacing existing entries), `removed` is a list of names.
+        """
+        with self._write_lock:
+            current = self.gallery
+            faces = dict(zip(current.names, current.encodings))
+            for name in removed or []:
+                faces.pop(name, None)
+            for name, encoding in (added or {}).items():
+                faces[name] = encoding
+            snapshot = GallerySnapshot.build(current.version + 1, faces)
+            self.gallery = snapshot
+        return snapshot.version
+
+    def _sync_loop(self):
+        while True:
+            try:
+                self.sync_gallery()
+            except Exception as e:
+                print(f"--- Gallery sync failed: {e} ---")
+            time.sleep(SHARED_STATE_TTL)
+
+    def _start_sync(self):
+        # Started on the first streamed frame, so workers that never stream never poll
+        if self._sync_thread: return
+        with self._sync_start_lock:
+            if self._sync_thread: return
+            self._sync_thread = threading.Thread(target=self._sync_loop, name="gallery-sync", daemon=True)
+            self._sync_thread.start()
+
+    def add_student(self, name, encoding):
+        return self.update_gallery(added={name: encoding})
+
+    def remove_student(self, name):
+        """Drops a single student from the in-memory gallery without a full reload."""
+        return self.update_gallery(removed=[name])
+
+    def _identify(self, face_locations, face_encodings, state_vars):
+        # Syncing (Mongo reads) happens on the gallery-sync thread; the frame path only reads the snapshot
+        self._start_sync()
+        face_names = []
+        face_statuses = []
+        detected_candidate = None
+        gallery = self.gallery
+
+        for encodeFace in face_encodings:
+            name = "Unknown"
+            status = "unknown"
+
+            if gallery.names:
+                matches = face_recognition.compare_faces(
+                    gallery.encodings,
+                    encodeFace,
+                    tolerance=MATCH_TOLERANCE
+                )
+
+                if True in matches:
+                    best_match_index = matches.index(True)
+                    real_name = gallery.names[best_match_index]
 
-        print(f"--- Loaded {len(self.known_face_names)} students from DB. ---")
+                    scan_status = get_scan_status(real_name)
 
-    def process_frame(self, frame, frame_count, state_vars):
+                    if scan_status == 'ready':
+                        status = "scannable"
+                        name = real_name
+                        detected_candidate = real_name
+                    elif scan_status == 'marked':
+                        status = "done"
+                        name = real_name
+
+            face_names.append(name)
+            face_statuses.append(status)
+
+        state_vars['last_locs'] = face_locations
+        state_vars['last_names'] = face_names
+        state_vars['last_statuses'] = face_statuses
+        state_vars['detected'] = detected_candidate
+
+    def process_frame(self, frame, frame_count, state_vars, results=None):
         UPSCALE = int(1 / SCALE)
         PROCESS_EVERY = 6  # 🔥 Increase for more speed (5–8 safe)
 
-        if frame_count % PROCESS_EVERY == 0:
-            small_frame = cv2.resize(frame, (0, 0), fx=SCALE, fy=SCALE)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        if results is not None:
+            # Detection runs in the camera owner's worker processes; results come through the ring
+            result = results.latest_result()
+            if result and result[0] > state_vars.get('result_seq', -1):
+                state_vars['result_seq'] = result[0]
+                self._identify(result[1], result[2], state_vars)
+
+        elif frame_count % PROCESS_EVERY == 0:
+            small_frame, rgb_small_frame = self._small_buffers(frame, state_vars)
+            cv2.resize(frame, (small_frame.shape[1], small_frame.shape[0]), dst=small_frame)
+            cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB, dst=rgb_small_frame)
 
             face_locations = face_recognition.face_locations(
                 rgb_small_frame,
@@ -54,42 +206,7 @@ class FaceSystem:
                     num_jitters=1
                 )
 
-            face_names = []
-            face_statuses = []
-            detected_candidate = None
-
-            for encodeFace in face_encodings:
-                name = "Unknown"
-                status = "unknown"
-
-                if self.known_face_encodings:
-                    matches = face_recognition.compare_faces(
-                        self.known_face_encodings,
-                        encodeFace,
-                        tolerance=MATCH_TOLERANCE
-                    )
-
-                    if True in matches:
-                        best_match_index = matches.index(True)
-                        real_name = self.known_face_names[best_match_index]
-
-                        scan_status = get_scan_status(real_name)
-
-                        if scan_status == 'ready':
-                            status = "scannable"
-                            name = real_name
-                            detected_candidate = real_name
-                        elif scan_status == 'marked':
-                            status = "done"
-                            name = real_name
-
-                face_names.append(name)
-                face_statuses.append(status)
-
-            state_vars['last_locs'] = face_locations
-            state_vars['last_names'] = face_names
-            state_vars['last_statuses'] = face_statuses
-            state_vars['detected'] = detected_candidate
+            self._identify(face_locations, face_encodings, state_vars)
 
         # --- Timer Logic (unchanged) ---
         detected = state_vars.get('detected')
@@ -107,7 +224,7 @@ class FaceSystem:
             state_vars['verified_name'] = None
             state_vars['recorded'] = False
 
-        # --- Drawing (unchanged) ---
+        # --- Drawing ---
         locations = state_vars.get('last_locs', [])
         names = state_vars.get('last_names', [])
         statuses = state_vars.get('last_statuses', [])
@@ -123,29 +240,61 @@ class FaceSystem:
                 is_recorded = state_vars.get('recorded') and is_verifying
 
                 if is_recorded:
-                    color = (0, 255, 0)
-                    label = f"{name} (OK)"
+                    kind = "ok"
                 elif is_verifying:
-                    color = (0, 165, 255)
-                    label = f"{name}..."
+                    kind = "verifying"
                 else:
-                    color = (0, 0, 255)
-                    label = name
-
+                    kind = "scannable"
             elif status == "done":
-                color = (0, 215, 255)
-                label = f"{name} (Done)"
-
+                kind = "done"
             else:
-                color = (100, 100, 100)
-                label = "Unknown"
+                kind = "unknown"
 
+            color, patch = self._label_patch(name, kind, right - left)
             cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-            cv2.putText(frame, label, (left + 6, bottom - 6),
-                        cv2.FONT_HERSHEY_DUPLEX, 0.7, (255, 255, 255), 1)
+            self._blit(frame, patch, left, bottom - LABEL_HEIGHT)
 
         return frame
 
+    def _small_buffers(self, frame, state_vars):
+        """Per-stream downscaled BGR/RGB buffers, reallocated only if the frame size changes."""
+        h, w = frame.shape[:2]
+        size = (int(round(h * SCALE)), int(round(w * SCALE)), 3)
+        small = state_vars.get('small_buf')
+        if small is None or small.shape != size:
+            small = state_vars['small_buf'] = np.empty(size, dtype=np.uint8)
+            state_vars['rgb_buf'] = np.empty(size, dtype=np.uint8)
+        return small, state_vars['rgb_buf']
+
+    def _label_patch(self, name, kind, width):
+        """Pre-rendered filled label bar; drawn once per (name, kind, width) and reused."""
+        key = (name, kind, width)
+        cached = _label_cache.get(key)
+        if cached is not None:
+            return cached
+
+        color, template = LABEL_STYLES[kind]
+        label = template.format(name=name)
+        (text_w, _), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.7, 1)
+        patch = np.empty((LABEL_HEIGHT, max(width, text_w + 12), 3), dtype=np.uint8)
+        patch[:] = color
+        cv2.putText(patch, label, (6, LABEL_HEIGHT - 6),
+                    cv2.FONT_HERSHEY_DUPLEX, 0.7, (255, 255, 255), 1)
+
+        if len(_label_cache) >= LABEL_CACHE_SIZE:
+            _label_cache.clear()
+        _label_cache[key] = (color, patch)
+        return color, patch
+
+    @staticmethod
+    def _blit(frame, patch, x, y):
+        """Copies patch into frame at (x, y), clipped to the frame bounds."""
+        h, w = frame.shape[:2]
+        ph, pw = patch.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + pw, w), min(y + ph, h)
+        if x0 >= x1 or y0 >= y1: return
+        frame[y0:y1, x0:x1] = patch[y0 - y:y1 - y, x0 - x:x1 - x]
+
 
 face_system = FaceSystem()
@@ -1,18 +1,24 @@
-from flask import Blueprint, render_template, Response, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, Response, request, redirect, url_for, flash, jsonify, make_response
 import cv2
 import time
 import os
 import io
 import csv
+import hashlib
+import shutil
+import tempfile
 import face_recognition 
 import numpy as np
 from datetime import datetime
 from core.config import DATASET_PATH
-from core.camera import get_camera, release_camera
+from core.camera import get_frame_reader
 from core.recognition import face_system
+from core.cache import view_cache, report_cache, current_version
+from core.jobs import submit as submit_job, get_job, list_jobs
+from core.batch import run_batch_attendance
 
 from core.attendance import (
-    get_records, state as attendance_state, set_active_session, active_session
+    get_records, state as attendance_state, set_active_session, get_active_session
 )
 from core.data_manager import (
     get_all_classes, create_class_group, add_subject_to_class, 
@@ -28,50 +34,108 @@ main = Blueprint('main', __name__)
 def format_time(value):
     return value 
 
-# --- Generators (Unchanged) ---
+# --- Generators ---
+PART_HEADER = b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n'
+PART_TRAILER = b'\r\n'
+
+def multipart_part(buffer):
+    """
+    One MJPEG part as a single bytes object, so the server does one write per
+    frame. join() reads the encoded array through the buffer protocol, so the
+    JPEG is copied once (no intermediate tobytes()/concatenation copies).
+    """
+    return b''.join((PART_HEADER, buffer, PART_TRAILER))
+
 def generate_frames():
-    camera = get_camera()
+    reader = get_frame_reader()
+    if reader is None: return
     frame_count = 0
+    last_seq = 0
+    frame = None
     state_vars = {'last_locs': [], 'last_names': [], 'verified_name': None, 'timer_start': 0, 'recorded': False, 'detected': None}
     while True:
-        if not camera.isOpened(): break
-        success, frame = camera.read()
-        if not success: break
-        frame = face_system.process_frame(frame, frame_count, state_vars)
+        ref = reader.wait_frame(last_seq)
+        if ref is None: break
+        last_seq, slot = ref
+        # Private copy for drawing, reused every frame; the ring slot stays untouched for the workers
+        copied = reader.read_into(last_seq, slot, frame)
+        if copied is None: continue
+        frame = face_system.process_frame(copied, frame_count, state_vars, reader.results)
         frame_count += 1
         ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        yield multipart_part(buffer)
 
 def generate_preview():
-    camera = get_camera()
+    reader = get_frame_reader()
+    if reader is None: return
+    last_seq = 0
+    preview = None
     while True:
-        if not camera.isOpened(): break
-        success, frame = camera.read()
-        if not success: break
-        preview = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+        ref = reader.wait_frame(last_seq)
+        if ref is None: break
+        last_seq, slot = ref
+        ring = reader.ring
+        if ring is None: break
+        view = ring.view(slot)
+        # Ring closed under us (reader stopped): end of stream
+        if view is None: break
+        if preview is None:
+            preview = np.empty((view.shape[0] // 2, view.shape[1] // 2, 3), dtype=np.uint8)
+        cv2.resize(view, (preview.shape[1], preview.shape[0]), dst=preview)
+        if ring.stamp(slot) != last_seq: continue
         ret, buffer = cv2.imencode('.jpg', preview)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        yield multipart_part(buffer)
+
+# --- Conditional responses ---
+def _etag(key):
+    return hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+
+def _conditional(body, key, mimetype=None, headers=None):
+    """Builds a response with an ETag for `key`; answers 304 when the client already has it."""
+    response = make_response(body)
+    if mimetype: response.mimetype = mimetype
+    for header, value in (headers or {}).items():
+        response.headers[header] = value
+    response.set_etag(_etag(key))
+    # Browsers must revalidate, but may reuse the body on 304
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # --- MAIN ROUTES ---
 
 @main.route('/')
 def index():
-    classes = get_all_classes()
-    available_dates = get_available_dates()
     today_str = datetime.now().strftime('%Y-%m-%d')
-    if today_str not in available_dates:
-        available_dates.insert(0, today_str)
-
     selection = request.args.get('session_key') 
     search_date = request.args.get('search_date')
     show_absent = request.args.get('show_absent', '1')
-    
+
+    # Records depend on the active session when none is selected, so it is part of the key
+    prior = get_active_session()
+    prior_key = (prior['class_id'], prior['subject_idx']) if prior else None
+    version = current_version()
+    cache_key = ('index', selection, search_date, show_absent, today_str, prior_key, version)
+
+    cached = view_cache.get(cache_key)
+    if cached:
+        html, session_args = cached
+        if session_args: set_active_session(*session_args)
+        # Re-activating may have written records; only serve if nothing changed
+        if current_version() == version:
+            return _conditional(html, cache_key)
+
+    classes = get_all_classes()
+    available_dates = _dashboard_dates(today_str)
+
     if not search_date: search_date = today_str
+    try:
+        datetime.strptime(search_date, '%Y-%m-%d')
+    except ValueError:
+        search_date = today_str
 
     current_class_id = None
     current_subject = None
+    session_args = None
     
     if not selection and classes:
         first_class = list(classes.keys())[0]
@@ -87,9 +151,18 @@ def index():
             if c_id in classes and 'subjects' in classes[c_id] and len(classes[c_id]['subjects']) > s_idx:
                 current_class_id = c_id
                 current_subject = classes[c_id]['subjects'][s_idx]
-                set_active_session(c_id, s_idx, current_subject)
+                session_args = (c_id, s_idx, current_subject)
+                set_active_session(*session_args)
         except: pass
 
+    # The page is keyed on the version read here, before the records are loaded: a write
+    # during the render then only makes this entry unreachable instead of caching stale data
+    render_version = current_version()
+    if render_version != version:
+        # Session init (or another writer) changed data after it was read above
+        classes = get_all_classes()
+        available_dates = _dashboard_dates(today_str)
+
     raw_records = get_records(search_date)
     dashboard_data = []
     raw_records.sort(key=lambda x: x['Name'])
@@ -99,7 +172,7 @@ def index():
             continue
         dashboard_data.append(log)
 
-    return render_template('index.html', 
+    html = render_template('index.html', 
                            records=dashboard_data, 
                            classes=classes, 
                            current_selection=selection,
@@ -108,14 +181,41 @@ def index():
                            available_dates=available_dates,
                            show_absent=show_absent)
 
+    cache_key = cache_key[:-1] + (render_version,)
+    view_cache.put(cache_key, (html, session_args))
+    return _conditional(html, cache_key)
+
+def _dashboard_dates(today_str):
+    available_dates = get_available_dates()
+    if today_str not in available_dates:
+        available_dates.insert(0, today_str)
+    return available_dates
+
 @main.route('/download_report')
 def download_report():
+    file_date = datetime.now().strftime("%Y%m%d")
+    cache_key = ('report', file_date, current_version())
+    body = report_cache.get(cache_key)
+    if body is None:
+        body = _build_report()
+        if body is None:
+            flash("No attendance data recorded yet.", "warning")
+            return redirect(url_for('main.index'))
+        report_cache.put(cache_key, body)
+
+    return _conditional(
+        body, cache_key,
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=attendance_full_{file_date}.csv'}
+    )
+
+def _build_report():
+    """Full CSV report as bytes, or None when there are no logs."""
     logs = get_all_logs()
     classes = get_all_classes() # Fetch class data to look up schedules
 
     if not logs:
-        flash("No attendance data recorded yet.", "warning")
-        return redirect(url_for('main.index'))
+        return None
 
     # Prepare data with Schedule Times
     enhanced_logs = []
@@ -151,16 +251,7 @@ def download_report():
     writer.writeheader()
     writer.writerows(enhanced_logs)
     
-    mem = io.BytesIO()
-    mem.write(proxy.getvalue().encode('utf-8'))
-    mem.seek(0)
-    
-    return send_file(
-        mem, 
-        as_attachment=True, 
-        download_name=f'attendance_full_{datetime.now().strftime("%Y%m%d")}.csv',
-        mimetype='text/csv'
-    )
+    return proxy.getvalue().encode('utf-8')
 
 @main.route('/manage_classes')
 def manage_classes():
@@ -183,8 +274,8 @@ def create_class():
 
 @main.route('/delete_class/<class_id>')
 def delete_class_route(class_id):
-    delete_class(class_id)
-    flash(f"Deleted {class_id}", "warning")
+    job_id = submit_job(f"Delete class {class_id}", delete_class, class_id)
+    flash(f"Deleting {class_id} in the background (job {job_id})", "warning")
     return redirect(url_for('main.manage_classes'))
 
 @main.route('/edit_class/<class_id>', methods=['GET', 'POST'])
@@ -238,17 +329,17 @@ def enroll_existing_student(class_id):
 @main.route('/remove_student/<class_id>/<student_name>')
 def remove_student_route(class_id, student_name):
     # Removes from class roster AND deletes logs for this specific class
-    remove_student_from_class(class_id, student_name)
-    flash(f"Removed {student_name} from {class_id} (Logs cleared for this class)", "warning")
+    job_id = submit_job(f"Remove {student_name} from {class_id}", remove_student_from_class, class_id, student_name)
+    flash(f"Removing {student_name} from {class_id} (Logs cleared for this class, job {job_id})", "warning")
     return redirect(url_for('main.edit_class', class_id=class_id))
 
 # --- ROUTE FOR GLOBAL DELETION (Redirects to Manage Students) ---
 @main.route('/delete_student_globally/<student_name>')
 def delete_student_globally_route(student_name):
-    delete_student_globally(student_name)
-    # Re-sync face system in runtime
-    face_system.load_training_data()
-    flash(f"PERMANENTLY deleted {student_name} data (Images, Logs, Enrollments).", "danger")
+    # Stop recognizing the student right away, the cascade runs in the background
+    face_system.remove_student(student_name)
+    job_id = submit_job(f"Delete student {student_name}", delete_student_globally, student_name)
+    flash(f"PERMANENTLY deleting {student_name} data (Images, Logs, Enrollments) - job {job_id}.", "danger")
     return redirect(url_for('main.manage_students'))
 
 @main.route('/delete_subject/<class_id>/<int:idx>')
@@ -292,30 +383,32 @@ def add_user():
         # 3. If No Uploads, Use Camera
         else:
             print(f"--- Starting Camera for {name} ---")
-            release_camera()
-            time.sleep(0.5)
-            cam = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+            # Frames come from the worker that owns the camera (via the shared ring),
+            # so enrollment never opens the device itself
+            reader = get_frame_reader()
             
             count = 0
-            while count < 5: 
-                ret, frame = cam.read()
-                if ret:
-                    # Save image to disk
-                    cv2.imwrite(f"{student_path}/{name}_{count}.jpg", frame)
-                    
-                    # Process frame for face encoding
-                    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    encs = face_recognition.face_encodings(rgb)
-                    
-                    if encs:
-                        captured_encodings.append(encs[0])
-
-                    count += 1
-                    cv2.waitKey(150)
-                else: 
-                    break
-            cam.release()
-            release_camera() 
+            last_seq = 0
+            frame = None
+            while reader is not None and count < 5: 
+                ref = reader.wait_frame(last_seq)
+                if ref is None: break
+                last_seq, slot = ref
+                frame = reader.read_into(last_seq, slot, frame)
+                if frame is None: continue
+
+                # Save image to disk
+                cv2.imwrite(f"{student_path}/{name}_{count}.jpg", frame)
+                
+                # Process frame for face encoding
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                encs = face_recognition.face_encodings(rgb)
+                
+                if encs:
+                    captured_encodings.append(encs[0])
+
+                count += 1
+                time.sleep(0.15)
 
         # 4. Save to Database (Common Step)
         if captured_encodings:
@@ -326,8 +419,7 @@ def add_user():
             save_student_face(name, avg_encoding)
             
             # Update Runtime System (so you don't need to restart)
-            face_system.known_face_names.append(name)
-            face_system.known_face_encodings.append(avg_encoding)
+            face_system.add_student(name, avg_encoding)
             
             # Add to Class Roster
             if class_id: 
@@ -353,4 +445,57 @@ def preview_feed():
     return Response(generate_preview(), mimetype='multipart/x-mixed-replace; boundary=frame')
 @main.route('/check_update')
 def check_update():
-    return jsonify({'last_update': attendance_state['last_update_time']})
\ No newline at end of file
+    version = current_version()
+    return _conditional(jsonify({'last_update': attendance_state['last_update_time']}), ('update', version))
+
+# --- OFFLINE ATTENDANCE (recorded video / group photos) ---
+def _run_batch_job(upload_dir, paths, class_id, subject_idx, when):
+    try:
+        return run_batch_attendance(paths, class_id, subject_idx, when)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+@main.route('/batch_attendance', methods=['POST'])
+def batch_attendance():
+    selection = request.form.get('session_key', '')
+    uploaded_files = [f for f in request.files.getlist('media') if f.filename]
+    if '|' not in selection or not uploaded_files:
+        return jsonify({'error': 'session_key (class|subject) and at least one media file are required'}), 400
+
+    class_id, s_idx = selection.split('|', 1)
+    try:
+        subject_idx = int(s_idx)
+        # A negative index would silently pick a subject from the end of the schedule
+        if subject_idx < 0: raise ValueError(s_idx)
+        when = datetime.now()
+        if request.form.get('date'):
+            when = datetime.strptime(request.form['date'], '%Y-%m-%d').replace(hour=when.hour, minute=when.minute)
+        if request.form.get('time'):
+            t = datetime.strptime(request.form['time'], '%H:%M')
+            when = when.replace(hour=t.hour, minute=t.minute)
+    except ValueError:
+        return jsonify({'error': 'Invalid subject index, date or time'}), 400
+
+    upload_dir = tempfile.mkdtemp(prefix='batch_')
+    paths = []
+    for count, file in enumerate(uploaded_files):
+        ext = os.path.splitext(file.filename)[1].lower()
+        file_path = os.path.join(upload_dir, f"media_{count}{ext}")
+        file.save(file_path)
+        paths.append(file_path)
+
+    job_id = submit_job(f"Batch attendance {class_id} #{subject_idx}", _run_batch_job,
+                        upload_dir, paths, class_id, subject_idx, when)
+    return jsonify({'job_id': job_id, 'status_url': url_for('main.job_status', job_id=job_id)}), 202
+
+# --- BACKGROUND JOBS ---
+@main.route('/jobs')
+def jobs_status():
+    return jsonify(list_jobs())
+
+@main.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
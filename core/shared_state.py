@@ -0,0 +1,50 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from core.config import runtime_col, CAMERA_LEASE_SECONDS
+
+# Identifies this process in the 'runtime' collection
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+# --- ACTIVE SESSION ---
+def save_session(session):
+    runtime_col.replace_one({"_id": "session"}, {"_id": "session", "session": session}, upsert=True)
+
+def load_session():
+    doc = runtime_col.find_one({"_id": "session"})
+    return doc.get("session") if doc else None
+
+
+# --- CAMERA OWNERSHIP ---
+def acquire_camera_lease(ring_info=None):
+    """
+    Claims (or renews) the camera for this worker. Only one worker holds the
+    lease at a time; it is taken over when the owner stops renewing it.
+    """
+    now = datetime.now()
+    # A new owner clears the previous owner's ring until it publishes its own
+    update = {"owner": WORKER_ID, "expires": now + timedelta(seconds=CAMERA_LEASE_SECONDS), "ring": ring_info}
+    try:
+        doc = runtime_col.find_one_and_update(
+            {"_id": "camera", "$or": [{"owner": WORKER_ID}, {"expires": {"$lt": now}}]},
+            {"$set": update},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lease document exists and belongs to a live worker
+        return False
+    return doc is not None and doc.get("owner") == WORKER_ID
+
+def release_camera_lease():
+    runtime_col.delete_one({"_id": "camera", "owner": WORKER_ID})
+
+def get_camera_lease():
+    """Current live lease (owner, expires, ring) or None."""
+    doc = runtime_col.find_one({"_id": "camera"})
+    if not doc or doc.get("expires", datetime.min) < datetime.now():
+        return None
+    return doc